@@ -1,10 +1,10 @@
 import pytest
 
-from subscriptions.providers import get_provider, get_providers
+from subscriptions.providers import get_provider
 from subscriptions.providers.apple_in_app import AppleInAppProvider
 
 
-@pytest.fixture
+@pytest.fixture(scope='session')
 def apple_bundle_id() -> str:
     return 'test-bundle-id'
 
@@ -15,8 +15,6 @@ def apple_in_app(settings, apple_bundle_id) -> AppleInAppProvider:
         'subscriptions.providers.apple_in_app.AppleInAppProvider',
     ]
     AppleInAppProvider.bundle_id = apple_bundle_id
-    get_provider.cache_clear()
-    get_providers.cache_clear()
     provider = get_provider()
     assert isinstance(provider, AppleInAppProvider)
     return provider
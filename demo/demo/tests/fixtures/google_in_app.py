@@ -6,7 +6,7 @@ from django.utils.timezone import now
 import pytest
 
 from subscriptions.models import Plan, Subscription, SubscriptionPayment
-from subscriptions.providers import get_provider, get_providers
+from subscriptions.providers import get_provider
 from subscriptions.providers.google_in_app import GoogleInAppProvider
 from subscriptions.providers.google_in_app.schemas import (
     GoogleAcknowledgementState,
@@ -27,14 +27,12 @@ def google_in_app(settings) -> str:
     settings.SUBSCRIPTIONS_PAYMENT_PROVIDERS = [
         'subscriptions.providers.google_in_app.GoogleInAppProvider',
     ]
-    get_provider.cache_clear()
-    get_providers.cache_clear()
     provider = get_provider()
     assert isinstance(provider, GoogleInAppProvider)
     return provider
 
 
-@pytest.fixture
+@pytest.fixture(scope='session')
 def google_plan_id() -> str:
     return 'some-crazy-name'
 
@@ -184,7 +182,7 @@ def google_in_app__subscription_purchase_dict(google_in_app) -> dict:
     }
 
 
-@pytest.fixture
+@pytest.fixture(scope='session')
 def purchase_token() -> str:
     return '12345'
 
@@ -28,14 +28,14 @@ from subscriptions.models import (
     SubscriptionPayment,
     Usage,
 )
-from subscriptions.providers import get_provider, get_providers
+from subscriptions.providers import get_provider
 from subscriptions.providers.dummy import DummyProvider
 from subscriptions.tasks import charge_recurring_subscriptions
 
 from ..helpers import days, usd
 
 
-@pytest.fixture
+@pytest.fixture(scope='session')
 def eps() -> timedelta:
     return timedelta(microseconds=1)
 
@@ -210,35 +210,19 @@ def two_subscriptions(user, resource) -> list[Subscription]:
 
     now_ = now()
 
-    plan1 = Plan.objects.create(codename='plan1', name='Plan 1')
-    subscription1 = Subscription.objects.create(
-        user=user,
-        plan=plan1,
-        start=now_,
-        end=now_ + days(10),
-    )
-    Quota.objects.create(
-        plan=plan1,
-        resource=resource,
-        limit=100,
-        recharge_period=days(5),
-        burns_in=days(7),
-    )
-
-    plan2 = Plan.objects.create(codename='plan2', name='Plan 2', charge_amount=Money(10, 'EUR'))
-    subscription2 = Subscription.objects.create(
-        user=user,
-        plan=plan2,
-        start=now_ + days(4),
-        end=now_ + days(14),
-    )
-    Quota.objects.create(
-        plan=plan2,
-        resource=resource,
-        limit=100,
-        recharge_period=days(5),
-        burns_in=days(7),
-    )
+    # bulk-created objects skip `save()`, so fields it would fill in are set explicitly
+    plan1, plan2 = Plan.objects.bulk_create([
+        Plan(codename='plan1', name='Plan 1', charge_period=INFINITY, max_duration=INFINITY),
+        Plan(codename='plan2', name='Plan 2', charge_amount=Money(10, 'EUR'), charge_period=INFINITY, max_duration=INFINITY),
+    ])
+    subscription1, subscription2 = Subscription.objects.bulk_create([
+        Subscription(user=user, plan=plan1, start=now_, end=now_ + days(10), auto_prolong=False),
+        Subscription(user=user, plan=plan2, start=now_ + days(4), end=now_ + days(14), auto_prolong=False),
+    ])
+    Quota.objects.bulk_create([
+        Quota(plan=plan, resource=resource, limit=100, recharge_period=days(5), burns_in=days(7))
+        for plan in (plan1, plan2)
+    ])
 
     Usage.objects.bulk_create([
         Usage(user=user, resource=resource, amount=50, datetime=now_ + days(1)),
@@ -263,12 +247,16 @@ def five_subscriptions(plan, user) -> list[Subscription]:
 
     now_ = now()
 
-    sub0 = Subscription.objects.create(user=user, plan=plan, start=now_ - days(5), end=now_ + days(2))
-    sub1 = Subscription.objects.create(user=user, plan=plan, start=sub0.start - days(5), end=sub0.start + days(2))
-    sub2 = Subscription.objects.create(user=user, plan=plan, start=sub1.start - days(5), end=sub1.start)
-    sub3 = Subscription.objects.create(user=user, plan=plan, start=sub1.start + days(1), end=sub0.start - days(1))
-    sub4 = Subscription.objects.create(user=user, plan=plan, start=sub2.start - days(5), end=sub2.start - days(1))
-    return [sub0, sub1, sub2, sub3, sub4]
+    sub0 = Subscription(user=user, plan=plan, start=now_ - days(5), end=now_ + days(2))
+    sub1 = Subscription(user=user, plan=plan, start=sub0.start - days(5), end=sub0.start + days(2))
+    sub2 = Subscription(user=user, plan=plan, start=sub1.start - days(5), end=sub1.start)
+    sub3 = Subscription(user=user, plan=plan, start=sub1.start + days(1), end=sub0.start - days(1))
+    sub4 = Subscription(user=user, plan=plan, start=sub2.start - days(5), end=sub2.start - days(1))
+
+    subscriptions = [sub0, sub1, sub2, sub3, sub4]
+    for subscription in subscriptions:
+        subscription.auto_prolong = plan.is_recurring()  # normally set by `save()`, which is skipped by bulk_create
+    return Subscription.objects.bulk_create(subscriptions)
 
 
 @pytest.fixture
@@ -283,8 +271,6 @@ def dummy(settings) -> str:
     settings.SUBSCRIPTIONS_PAYMENT_PROVIDERS = [
         'subscriptions.providers.dummy.DummyProvider',
     ]
-    get_provider.cache_clear()
-    get_providers.cache_clear()
     provider = get_provider()
     assert isinstance(provider, DummyProvider)
     return provider
@@ -308,14 +294,14 @@ def payment(dummy, subscription) -> SubscriptionPayment:
     )
 
 
-@pytest.fixture
+@pytest.fixture(scope='session')
 def card_number() -> str:
     return ' '.join(['4242'] * 4)
 
 
-@pytest.fixture
-def charge_schedule() -> list[timedelta]:
-    return [
+@pytest.fixture(scope='session')
+def charge_schedule() -> tuple[timedelta, ...]:
+    return (
         timedelta(days=-7),
         timedelta(days=-3),
         timedelta(days=-1),
@@ -324,7 +310,7 @@ def charge_schedule() -> list[timedelta]:
         timedelta(days=1),
         timedelta(days=3),
         timedelta(days=7),
-    ]
+    )
 
 
 @pytest.fixture
@@ -1,7 +1,7 @@
 import pytest
 
 from subscriptions.models import SubscriptionPayment
-from subscriptions.providers import get_provider, get_providers
+from subscriptions.providers import get_provider
 from subscriptions.providers.paddle import PaddleProvider
 
 from ..helpers import usd
@@ -12,8 +12,6 @@ def paddle(settings) -> str:
     settings.SUBSCRIPTIONS_PAYMENT_PROVIDERS = [
         'subscriptions.providers.paddle.PaddleProvider',
     ]
-    get_provider.cache_clear()
-    get_providers.cache_clear()
     provider = get_provider()
     assert isinstance(provider, PaddleProvider)
     return provider
@@ -2,6 +2,9 @@ from datetime import datetime
 from djmoney.money import Money
 from dateutil.relativedelta import relativedelta
 
+from subscriptions.fields import relativedelta_to_dict
+from subscriptions.models import Plan
+
 
 def usd(value) -> Money:
     return Money(value, 'USD')
@@ -13,3 +16,17 @@ def days(n: int):
 
 def datetime_to_api(dt: datetime) -> str:
     return dt.isoformat().replace('+00:00', 'Z')  # .replace(microsecond=0)
+
+
+def plan_to_api(plan: Plan) -> dict:
+    return {
+        'id': plan.id,
+        'codename': plan.codename,
+        'name': plan.name,
+        'charge_amount': plan.charge_amount and plan.charge_amount.amount,
+        'charge_amount_currency': str(plan.charge_amount.currency) if plan.charge_amount else 'USD',
+        'charge_period': relativedelta_to_dict(plan.charge_period),
+        'max_duration': relativedelta_to_dict(plan.max_duration),
+        'is_recurring': plan.is_recurring(),
+        'metadata': plan.metadata,
+    }
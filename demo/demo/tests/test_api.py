@@ -4,38 +4,26 @@ from datetime import timedelta
 
 import pytest
 from dateutil.relativedelta import relativedelta
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
 from django.utils.timezone import now
 from freezegun import freeze_time
 from more_itertools import one
 
 from subscriptions.exceptions import PaymentError
-from subscriptions.fields import relativedelta_to_dict
 from subscriptions.functions import use_resource
 from subscriptions.models import Subscription, SubscriptionPayment, Usage
 from subscriptions.providers import get_providers
 
-from .helpers import datetime_to_api, days
+from .helpers import datetime_to_api, days, plan_to_api
 
 
 @pytest.mark.django_db(databases=['actual_db'])
 def test__api__plans(plan, client):
     response = client.get('/api/plans/')
     assert response.status_code == 200
-    assert response.json() == [
-        {
-            'id': plan.id,
-            'codename': plan.codename,
-            'name': plan.name,
-            'charge_amount': plan.charge_amount.amount,
-            'charge_amount_currency': str(plan.charge_amount.currency),
-            'charge_period': relativedelta_to_dict(plan.charge_period),
-            'max_duration': relativedelta_to_dict(plan.max_duration),
-            'is_recurring': plan.is_recurring(),
-            'metadata': {
-                'this': 'that',
-            },
-        },
-    ]
+    assert response.json() == [plan_to_api(plan)]
+    assert response.json()[0]['metadata'] == {'this': 'that'}
 
 
 # def test_payment_providers(client):
@@ -66,20 +54,33 @@ def test__api__subscriptions__authorized(user_client, two_subscriptions):
         'quantity': 1,
         'next_charge_date': None,
         'payment_provider_class': None,
-        'plan': {
-            'id': subscription.plan.id,
-            'codename': subscription.plan.codename,
-            'name': subscription.plan.name,
-            'charge_amount': subscription.plan.charge_amount and subscription.plan.charge_amount.amount,
-            'charge_amount_currency': str(subscription.plan.charge_amount.currency) if subscription.plan.charge_amount else 'USD',
-            'charge_period': relativedelta_to_dict(subscription.plan.charge_period),
-            'max_duration': relativedelta_to_dict(subscription.plan.max_duration),
-            'is_recurring': subscription.plan.is_recurring(),
-            'metadata': {},
-        }
+        'plan': plan_to_api(subscription.plan),
     }]
 
 
+@pytest.mark.django_db(databases=['actual_db'])
+def test__api__subscriptions__performance(user, user_client, payment, dummy):
+    def count_queries() -> int:
+        with CaptureQueriesContext(connections['actual_db']) as queries:
+            response = user_client.get('/api/subscriptions/')
+        assert response.status_code == 200, response.content
+        return len(queries)
+
+    num_queries = count_queries()
+
+    # plans and reference payments of subscriptions are fetched in bulk
+    for _ in range(3):
+        SubscriptionPayment.objects.create(
+            user=user,
+            plan=payment.plan,
+            subscription=Subscription.objects.create(user=user, plan=payment.plan),
+            provider_codename=dummy.codename,
+            status=SubscriptionPayment.Status.COMPLETED,
+        )
+
+    assert count_queries() == num_queries
+
+
 @pytest.mark.django_db(databases=['actual_db'])
 def test__api__subscriptions__next_charge_date(user_client, subscription):
     subscription.end = now() + relativedelta(days=90)
@@ -131,8 +132,9 @@ def test__api__subscribe__authorized(client, user_client, plan, dummy):
     response = user_client.post('/api/subscribe/', {'plan': plan.id, 'quantity': 2})
     assert response.status_code == 200, response.content
     result = response.json()
+    payment = SubscriptionPayment.objects.latest()
     assert result['plan'] == plan.id
-    assert result['payment_id'] == SubscriptionPayment.objects.latest().id
+    assert result['payment_id'] == payment.id
     assert result['quantity'] == 2
     assert result['redirect_url'].startswith('/payment/')
     assert result['background_charge_succeeded'] is False
@@ -143,7 +145,6 @@ def test__api__subscribe__authorized(client, user_client, plan, dummy):
     assert len(subscriptions) == 0
 
     # manually invoke webhook
-    payment = SubscriptionPayment.objects.latest()
     response = client.post('/api/webhook/dummy/', {'transaction_id': payment.provider_transaction_id})
     assert response.status_code == 200, response.content
 
@@ -223,12 +224,12 @@ def test__api__recharge_plan_subscription(client, user_client, subscription, quo
         result = response.json()
         assert result['plan'] == recharge_plan.id
         assert result['quantity'] == 1
-        assert result['payment_id'] == SubscriptionPayment.objects.latest().id
+        payment = SubscriptionPayment.objects.latest()
+        assert result['payment_id'] == payment.id
         assert result['redirect_url'].startswith('/payment/')
         assert result['background_charge_succeeded'] is False
 
-        transaction_id = SubscriptionPayment.objects.latest().provider_transaction_id
-        response = client.post('/api/webhook/dummy/', {'transaction_id': transaction_id})
+        response = client.post('/api/webhook/dummy/', {'transaction_id': payment.provider_transaction_id})
         assert response.status_code == 200, response.content
 
     with freeze_time(subscription.start + days(3)):
@@ -4,6 +4,7 @@ from datetime import datetime
 
 import pytest
 import requests
+import tenacity
 
 from subscriptions.providers.apple_in_app.api import (
     AppleEnvironment,
@@ -41,12 +42,10 @@ def make_json_response_with_status(status: AppleValidationStatus, retryable: boo
     return json.dumps(response)
 
 
-def make_mock_response(code: int, data_json: str) -> unittest.mock.MagicMock:
-    result = unittest.mock.MagicMock()
-    result.raise_for_status = unittest.mock.MagicMock()
-    if code != 200:
-        result.raise_for_status = unittest.mock.MagicMock(side_effect=requests.HTTPError(code))
-    result.json = unittest.mock.MagicMock(return_value=json.loads(data_json))
+def make_mock_response(code: int, data_json: str) -> requests.Response:
+    result = requests.Response()
+    result.status_code = code
+    result._content = data_json.encode('utf-8')
     return result
 
 
@@ -63,7 +62,9 @@ def make_api_call(service_responses: list[tuple[int, str]]) \
     fake_session.post = unittest.mock.MagicMock(side_effect=responses)
     api._session = fake_session
 
-    result = api.fetch_receipt_data('receipt-data')
+    # retries are asserted by call count, so there's no point in waiting between them
+    with unittest.mock.patch.object(AppleAppStoreAPI._fetch_receipt_from_endpoint.retry, 'wait', tenacity.wait_none()):
+        result = api.fetch_receipt_data('receipt-data')
 
     return result, fake_session.post.call_args_list
 
@@ -1,4 +1,5 @@
 import pytest
+from django.db import connections
 
 from subscriptions.models import Subscription, SubscriptionPayment
 from subscriptions.tasks import check_duplicated_payments
@@ -94,3 +95,24 @@ def test__duplicates__duplicated_transactions(user, plan):
     assert ('test-1', 'transaction-1') in results
     entries = results[('test-1', 'transaction-1')]
     assert {payment_1.uid, payment_2.uid} == set([entry.uid for entry in entries])
+
+
+@pytest.mark.django_db(databases=['actual_db'])
+def test__duplicates__performance(user, plan, django_assert_num_queries):
+    subscription = Subscription.objects.create(
+        user=user,
+        plan=plan,
+    )
+    for transaction_id in ['transaction-1', 'transaction-1', 'transaction-2', 'transaction-2', 'transaction-3']:
+        SubscriptionPayment.objects.create(
+            user=user,
+            plan=plan,
+            subscription=subscription,
+            provider_codename='test-1',
+            provider_transaction_id=transaction_id,
+        )
+
+    with django_assert_num_queries(1, connection=connections['actual_db']):
+        results = check_duplicated_payments()
+
+    assert set(results) == {('test-1', 'transaction-1'), ('test-1', 'transaction-2')}
@@ -0,0 +1,81 @@
+import asyncio
+import json
+from unittest import mock
+
+import httpx
+import pytest
+from tenacity import wait_none
+
+from subscriptions.providers.paddle.api import PaddleError
+from subscriptions.providers.paddle.async_api import AsyncPaddle
+
+
+def make_paddle(handler) -> AsyncPaddle:
+    paddle = AsyncPaddle(vendor_id=123, vendor_auth_code='secret', endpoint='https://paddle.test/api/2.0')
+    asyncio.run(paddle.aclose())
+    paddle._client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url=paddle.endpoint)
+    return paddle
+
+
+def success(response) -> httpx.Response:
+    return httpx.Response(200, json={'success': True, 'response': response})
+
+
+def test__paddle_async_api__get__auth_params():
+    captured = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        captured.append(request)
+        return success([{'id': 1}])
+
+    paddle = make_paddle(handler)
+    assert asyncio.run(paddle.list_subscription_plans()) == [{'id': 1}]
+
+    request = captured[0]
+    assert request.method == 'GET'
+    assert request.url.path == '/api/2.0/subscription/plans'
+    assert dict(request.url.params) == {'vendor_id': '123', 'vendor_auth_code': 'secret'}
+
+
+def test__paddle_async_api__post__auth_params():
+    captured = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        captured.append(request)
+        return success({'invoice_id': 1})
+
+    paddle = make_paddle(handler)
+    assert asyncio.run(paddle.one_off_charge(subscription_id=42, amount=10, name='foo')) == {'invoice_id': 1}
+
+    request = captured[0]
+    assert request.method == 'POST'
+    assert request.url.path == '/api/2.0/subscription/42/charge'
+    payload = json.loads(request.content)
+    assert payload['vendor_id'] == 123
+    assert payload['vendor_auth_code'] == 'secret'
+    assert payload['charge_name'] == 'foo'
+
+
+def test__paddle_async_api__error():
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={'success': False, 'error': {'code': 107, 'message': 'Not allowed'}})
+
+    paddle = make_paddle(handler)
+    with pytest.raises(PaddleError) as exc_info:
+        asyncio.run(paddle.list_subscription_plans())
+
+    assert exc_info.value.code == 107
+
+
+@pytest.mark.parametrize('status_code', [429, 500, 502, 503, 504])
+def test__paddle_async_api__retry(status_code):
+    responses = iter([httpx.Response(status_code), success([])])
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return next(responses)
+
+    paddle = make_paddle(handler)
+    with mock.patch.object(paddle.request.retry, 'wait', wait_none()):
+        assert asyncio.run(paddle.list_subscription_plans()) == []
+
+    assert next(responses, None) is None
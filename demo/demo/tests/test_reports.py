@@ -1,6 +1,7 @@
 from collections import Counter
 from datetime import timedelta
 
+from django.db import connections
 from django.utils.timezone import now
 from freezegun import freeze_time
 from more_itertools import partition
@@ -283,7 +284,18 @@ def test__reports__transactions__payments__incompleted__amounts(reports_payments
 def test__reports__transactions__payments__incompleted__total(reports_payments, paddle):
     now_ = reports_payments[0].created
 
-    TransactionsReport(provider_codename=paddle.codename, since=now_, until=now_+days(30)).get_incompleted_payments_total() == usd(800)
+    assert TransactionsReport(provider_codename=paddle.codename, since=now_, until=now_+days(30)).get_incompleted_payments_total() == usd(800)
+
+
+@pytest.mark.django_db(databases=['actual_db'])
+def test__reports__transactions__totals__performance(reports_payments, paddle, django_assert_num_queries):
+    now_ = reports_payments[0].created
+
+    for since, until in [(now_, now_+days(30)), (now_-days(2), now_-days(1))]:
+        report = TransactionsReport(provider_codename=paddle.codename, since=since, until=until)
+        for get_total in (report.get_completed_payments_total, report.get_incompleted_payments_total, report.get_refunds_total):
+            with django_assert_num_queries(1, connection=connections['actual_db']):
+                get_total()
 
 
 @pytest.mark.django_db(databases=['actual_db'])
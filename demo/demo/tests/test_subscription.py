@@ -100,6 +100,40 @@ def test__subscription__iter_charge_dates__initial_charge_offset(plan, subscript
     assert list(islice(subscription.iter_charge_dates(), 5)) == expected_charge_dates
 
 
+@pytest.mark.django_db(databases=['actual_db'])
+def test__subscription__iter_charge_dates__distant_since(plan, subscription):
+    plan.charge_period = relativedelta(months=1)
+    plan.save()
+
+    subscription.start = datetime(2021, 1, 31, 12, 00, 00, tzinfo=tz.utc)
+    subscription.end = subscription.start + days(30)
+    subscription.save()
+
+    assert list(islice(subscription.iter_charge_dates(since=datetime(2121, 2, 28, 12, 00, 00, tzinfo=tz.utc)), 3)) == [
+        datetime(2121, 2, 28, 12, 00, 00, tzinfo=tz.utc),
+        datetime(2121, 3, 31, 12, 00, 00, tzinfo=tz.utc),
+        datetime(2121, 4, 30, 12, 00, 00, tzinfo=tz.utc),
+    ]
+    assert list(islice(subscription.iter_charge_dates(since=datetime(2121, 3, 1, tzinfo=tz.utc)), 1)) == [
+        datetime(2121, 3, 31, 12, 00, 00, tzinfo=tz.utc),
+    ]
+
+
+@pytest.mark.django_db(databases=['actual_db'])
+def test__subscription__iter_charge_dates__since_near_max(plan, subscription):
+    plan.charge_period = relativedelta(months=1)
+    plan.save()
+
+    subscription.start = datetime(2021, 1, 31, 12, 00, 00, tzinfo=tz.utc)
+    subscription.end = subscription.start + days(30)
+    subscription.save()
+
+    assert list(islice(subscription.iter_charge_dates(since=datetime(9999, 11, 1, tzinfo=tz.utc)), 2)) == [
+        datetime(9999, 11, 30, 12, 00, 00, tzinfo=tz.utc),
+        datetime(9999, 12, 31, 12, 00, 00, tzinfo=tz.utc),
+    ]
+
+
 @pytest.mark.django_db(databases=['actual_db'])
 def test__subscription__iter_charge_dates__performance(subscription, django_assert_num_queries):
     with django_assert_num_queries(0, connection=connections['actual_db']):
@@ -171,6 +205,30 @@ def test__subscription__expiring__performance(django_assert_num_queries, two_sub
         list(Subscription.objects.expiring(within=days(5)))
 
 
+@pytest.mark.django_db(databases=['actual_db'])
+def test__subscription__with_reference_payments(subscription, payment, two_subscriptions, django_assert_num_queries):
+    SubscriptionPayment.objects.create(
+        user=subscription.user,
+        plan=subscription.plan,
+        subscription=subscription,
+        provider_codename=payment.provider_codename,
+        status=SubscriptionPayment.Status.COMPLETED,
+        created=payment.created - days(1),
+    )
+
+    with django_assert_num_queries(2, connection=connections['actual_db']):
+        subscriptions = {
+            subscription.pk: subscription
+            for subscription in Subscription.objects.with_reference_payments()
+        }
+
+    with django_assert_num_queries(0, connection=connections['actual_db']):
+        assert subscriptions[subscription.pk].get_reference_payment() == payment
+        for other_subscription in two_subscriptions:
+            with pytest.raises(SubscriptionPayment.DoesNotExist):
+                subscriptions[other_subscription.pk].get_reference_payment()
+
+
 @pytest.mark.django_db(databases=['actual_db'])
 def test__subscription__charge_offline__without_prev_payments(subscription):
     with pytest.raises(PaymentError):
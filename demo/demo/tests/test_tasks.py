@@ -1,17 +1,22 @@
 from __future__ import annotations
 
 import logging
+import threading
 from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 from unittest import mock
 
 import pytest
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.test.utils import CaptureQueriesContext
 from django.utils.timezone import now
 from freezegun import freeze_time
 from more_itertools import spy
 
-from subscriptions.exceptions import PaymentError
-from subscriptions.models import Subscription, SubscriptionPayment
+from subscriptions.exceptions import PaymentError, ProviderNotFound
+from subscriptions.models import Plan, Subscription, SubscriptionPayment
+from subscriptions.providers import get_provider
 from subscriptions.tasks import (
     charge_recurring_subscriptions,
     notify_stuck_pending_payments,
@@ -328,3 +333,189 @@ def test__tasks__notify_stuck_pending_payments(subscription, user, caplog):
         assert len(caplog.records) == 2
         assert caplog.records[0].message == f'Payment stuck in pending state: {very_old_payment}'
         assert caplog.records[1].message == f'Payment stuck in pending state: {slightly_old_payment}'
+
+
+@pytest.mark.django_db(databases=['actual_db'])
+def test__tasks__charge_expiring__already_charged__performance(
+    subscription,
+    payment,
+    charge_expiring,
+    charge_schedule,
+):
+    charge_period = charge_schedule[-3:-1]
+
+    for _ in range(3):
+        other_subscription = Subscription.objects.get(pk=subscription.pk)
+        other_subscription.pk = None
+        other_subscription.save()
+
+    with freeze_time(subscription.end + middle(charge_period)):
+        charge_expiring(payment_status=SubscriptionPayment.Status.PENDING)
+        assert SubscriptionPayment.objects.count() == 2 + 3
+
+    with freeze_time(subscription.end + middle(charge_period)):
+        with CaptureQueriesContext(connections['actual_db']) as queries:
+            charge_expiring(payment_status=SubscriptionPayment.Status.PENDING)
+
+        assert SubscriptionPayment.objects.count() == 2 + 3
+        # charged subscriptions are filtered out in SQL, unexpected attempts are looked up separately
+        assert len(queries.captured_queries) == 2
+
+
+@pytest.mark.django_db(databases=['actual_db'])
+def test__tasks__charge_expiring__unexpected_attempts_logged(
+    subscription,
+    payment,
+    charge_expiring,
+    charge_schedule,
+    caplog,
+):
+    charge_period = charge_schedule[-3:-1]
+
+    for status in [SubscriptionPayment.Status.ERROR, SubscriptionPayment.Status.COMPLETED]:
+        attempt = SubscriptionPayment.objects.get(pk=payment.pk)
+        attempt.pk = None
+        attempt.status = status
+        attempt.created = subscription.end + charge_period[0]
+        attempt.save()
+
+    with freeze_time(subscription.end + middle(charge_period)):
+        with caplog.at_level(logging.WARNING):
+            charge_expiring()
+
+    assert SubscriptionPayment.objects.count() == 3
+    assert 'Multiple payment attempts detected' in caplog.text
+    assert 'Previous payment attempt was successful but subscription end is still approaching' in caplog.text
+
+
+@pytest.mark.django_db(transaction=True, databases=['actual_db'])
+def test__tasks__charge_expiring__skip_locked(
+    subscription,
+    payment,
+    charge_schedule,
+):
+    charge_period = charge_schedule[1:3]
+    locked, release = threading.Event(), threading.Event()
+
+    def hold_lock():
+        with transaction.atomic(using='actual_db'):
+            list(Subscription.objects.filter(pk=subscription.pk).select_for_update())
+            locked.set()
+            release.wait(timeout=5)
+        connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pool.submit(hold_lock)
+        assert locked.wait(timeout=5)
+
+        with freeze_time(subscription.end + middle(charge_period)):
+            charge_recurring_subscriptions(schedule=charge_schedule, num_threads=1)
+            assert SubscriptionPayment.objects.count() == 1
+
+        release.set()
+
+    with freeze_time(subscription.end + middle(charge_period)):
+        charge_recurring_subscriptions(schedule=charge_schedule, num_threads=1)
+        assert SubscriptionPayment.objects.count() == 2
+
+
+def test__tasks__get_provider__cache_cleared_on_settings_change(dummy, settings):
+    assert get_provider() is dummy
+
+    settings.SUBSCRIPTIONS_PAYMENT_PROVIDERS = []
+    with pytest.raises(ProviderNotFound):
+        get_provider()
+
+
+@pytest.mark.django_db(databases=['actual_db'])
+def test__tasks__charge_expiring__payment_failure__performance(
+    subscription,
+    payment,
+    charge_schedule,
+    dummy,
+):
+    for _ in range(3):
+        other_subscription = Subscription.objects.get(pk=subscription.pk)
+        other_subscription.pk = None
+        other_subscription.save()
+
+    def raise_payment_error(*args, **kwargs):
+        raise PaymentError('Something went wrong')
+
+    with freeze_time(subscription.end + charge_schedule[-2], tick=True):
+        with mock.patch.object(dummy, 'charge_offline', raise_payment_error):
+            with CaptureQueriesContext(connections['actual_db']) as queries:
+                charge_recurring_subscriptions(schedule=charge_schedule, num_threads=1)
+
+    assert SubscriptionPayment.objects.filter(status=SubscriptionPayment.Status.ERROR).count() == 4
+
+    # users and plans are fetched along with subscriptions and never re-fetched
+    tables = [get_user_model()._meta.db_table, Plan._meta.db_table]
+    assert len([query for query in queries.captured_queries if any(table in query['sql'] for table in tables)]) == 1
+
+
+@pytest.mark.django_db(databases=['actual_db'])
+def test__tasks__charge_expiring__prolongation_impossible(
+    subscription,
+    payment,
+    charge_expiring,
+    charge_schedule,
+):
+    subscription.plan.max_duration = subscription.plan.charge_period
+    subscription.plan.save(update_fields=['max_duration'])
+    subscription.end = subscription.start + subscription.plan.charge_period
+    subscription.save(update_fields=['end'])
+
+    with freeze_time(subscription.end + charge_schedule[-2]):
+        charge_expiring()
+
+    assert SubscriptionPayment.objects.count() == 1
+    subscription.refresh_from_db()
+    assert not subscription.auto_prolong
+
+
+@pytest.mark.django_db(databases=['actual_db'])
+def test__tasks__charge_expiring__max_threads(
+    subscription,
+    payment,
+    charge_schedule,
+    caplog,
+):
+    with freeze_time(subscription.end + charge_schedule[-2]):
+        with mock.patch('subscriptions.tasks.ThreadPoolExecutor', wraps=ThreadPoolExecutor) as executor:
+            charge_recurring_subscriptions(schedule=charge_schedule, num_threads=1000)
+
+    executor.assert_called_once_with(max_workers=1)  # not more threads than subscriptions
+    assert 'Requested 1000 charging threads' in caplog.text
+
+
+@pytest.mark.django_db(databases=['actual_db'])
+def test__tasks__charge_expiring__pagination(
+    subscription,
+    payment,
+    charge_expiring,
+    charge_schedule,
+    monkeypatch,
+):
+    for _ in range(4):
+        other_subscription = Subscription.objects.get(pk=subscription.pk)
+        other_subscription.pk = None
+        other_subscription.save()
+
+    monkeypatch.setattr('subscriptions.tasks.CHARGE_PAGE_SIZE', 2)
+    with freeze_time(subscription.end + charge_schedule[-2]):
+        charge_expiring(payment_status=SubscriptionPayment.Status.PENDING)
+
+    assert SubscriptionPayment.objects.count() == 1 + 5
+    assert set(SubscriptionPayment.objects.values_list('subscription', flat=True)) == set(Subscription.objects.values_list('pk', flat=True))
+
+
+@pytest.mark.django_db(databases=['actual_db'])
+def test__tasks__charge_expiring__single_delta_schedule(
+    subscription,
+    payment,
+    django_assert_num_queries,
+):
+    with freeze_time(subscription.end):
+        with django_assert_num_queries(0, connection=connections['actual_db']):
+            charge_recurring_subscriptions(schedule=[timedelta(0)], num_threads=1)
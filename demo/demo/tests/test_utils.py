@@ -1,5 +1,9 @@
+from datetime import datetime, timezone
+
 import pytest
-from subscriptions.utils import merge_iter, NonMonothonicSequence
+from django.db import connections, transaction
+from django.test.utils import CaptureQueriesContext
+from subscriptions.utils import fromisoformat, HardDBLock, merge_iter, NonMonothonicSequence
 
 
 def test__utils__merge_iter():
@@ -16,3 +20,71 @@ def test__utils__merge_iter__non_monothonic():
             (1, 5, 10),
             (5, 6, 3),
         ))
+
+
+def test__utils__merge_iter__key():
+    assert list(merge_iter(
+        [(1, 'a'), (3, 'b')],
+        [],
+        [(1, 'c'), (2, 'd')],
+        key=lambda x: x[0],
+    )) == [(1, 'a'), (1, 'c'), (2, 'd'), (3, 'b')]
+
+
+def test__utils__fromisoformat():
+    expected = datetime(2023, 1, 2, 3, 4, 5, 123456, tzinfo=timezone.utc)
+    assert fromisoformat('2023-01-02T03:04:05.123456Z') == expected
+    assert fromisoformat('2023-01-02T03:04:05.123456+00:00') == expected
+
+
+def test__utils__merge_iter__two_iterables():
+    assert list(merge_iter((1, 3, 3, 8), (2, 3, 4))) == [1, 2, 3, 3, 3, 4, 8]
+    assert list(merge_iter((), (1, 2))) == [1, 2]
+    assert list(merge_iter((1, 2), ())) == [1, 2]
+
+    with pytest.raises(NonMonothonicSequence):
+        list(merge_iter((1, 5), (2, 1)))
+
+
+def test__utils__merge_iter__key_computed_once():
+    calls = []
+
+    def key(value):
+        calls.append(value)
+        return value
+
+    assert list(merge_iter((1, 4), (2, 3), (0, 5), key=key)) == [0, 1, 2, 3, 4, 5]
+    assert sorted(calls) == [0, 1, 2, 3, 4, 5]
+
+
+def test__utils__hard_db_lock__enabled_read_once(monkeypatch):
+    monkeypatch.setenv('ENABLE_HARD_DB_LOCK', 'false')
+    lock = HardDBLock('marker', 'value')
+
+    monkeypatch.setenv('ENABLE_HARD_DB_LOCK', 'true')
+    with lock:  # must not touch the DB, as the lock was created disabled
+        pass
+
+
+@pytest.mark.django_db(databases=['actual_db'])
+def test__utils__hard_db_lock__no_savepoint():
+    with transaction.atomic(using='actual_db'):
+        with CaptureQueriesContext(connections['actual_db']) as queries:
+            with HardDBLock('1', 2, savepoint=False):
+                pass
+
+    assert [query['sql'] for query in queries.captured_queries] == ['SELECT pg_advisory_xact_lock(1, 2)']
+
+
+def test__utils__hard_db_lock__lock_ids_stable():
+    # lock ids must not change between releases, otherwise old and new processes won't block each other
+    assert HardDBLock._pg_str_to_int('1000000123456') == 1000000123456 % HardDBLock.PSQL_MAX_LOCK_VALUE
+    assert HardDBLock._pg_str_to_int('subscription') == 1417638586
+
+
+def test__utils__merge_iter__single_or_no_iterables():
+    assert list(merge_iter()) == []
+    assert list(merge_iter((1, 2, 2, 3))) == [1, 2, 2, 3]
+
+    with pytest.raises(NonMonothonicSequence):
+        list(merge_iter((1, 3, 2)))
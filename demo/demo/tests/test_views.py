@@ -0,0 +1,24 @@
+import pytest
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+from subscriptions.models import Plan
+
+
+@pytest.mark.django_db(databases=['actual_db'])
+def test__views__plan_subscription(user_client, plan, dummy):
+    with CaptureQueriesContext(connections['actual_db']) as queries:
+        response = user_client.get(f'/subscribe/{plan.id}/subscribe/?provider={dummy.codename}')
+
+    assert response.status_code == 200
+    assert response.context['plan'] == plan
+    assert len([
+        query for query in queries.captured_queries
+        if f'FROM "{Plan._meta.db_table}"' in query['sql']
+    ]) == 1
+
+
+@pytest.mark.django_db(databases=['actual_db'])
+def test__views__plan_subscription__not_found(user_client, plan, dummy):
+    response = user_client.get(f'/subscribe/{plan.id + 1}/subscribe/?provider={dummy.codename}')
+    assert response.status_code == 404
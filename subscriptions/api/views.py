@@ -69,7 +69,7 @@ class SubscriptionListView(ListAPIView):
     ordering = '-end', '-uid',
 
     def get_queryset(self):
-        return Subscription.objects.active().select_related('plan').filter(user=self.request.user)
+        return Subscription.objects.active().select_related('plan').with_reference_payments().filter(user=self.request.user)
 
 
 class SubscriptionView(DestroyAPIView):
@@ -232,7 +232,7 @@ class PaymentView(RetrieveAPIView):
     permission_classes = IsAuthenticated,
     serializer_class = SubscriptionPaymentSerializer
     schema = AutoSchema()
-    queryset = SubscriptionPayment.objects.all()
+    queryset = SubscriptionPayment.objects.select_related('subscription__plan')
     lookup_url_kwarg = 'uid'
 
     def post(self, request, *args, **kwargs):
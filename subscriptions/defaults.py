@@ -23,6 +23,8 @@ DEFAULT_SUBSCRIPTIONS_OFFLINE_CHARGE_ATTEMPTS_SCHEDULE = (
     timedelta(hours=-1),
     timedelta(0),
 )
+# every charging thread holds its own DB connection
+DEFAULT_SUBSCRIPTIONS_OFFLINE_CHARGE_MAX_THREADS = 8
 
 DEFAULT_SUBSCRIPTIONS_CACHE_NAME = 'subscriptions'
 DEFAULT_SUBSCRIPTIONS_CURRENCY = 'USD'
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-16 18:38
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('subscriptions', '0036_auto_20230711_0614'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='subscription',
+            index=models.Index(fields=['start', 'end', 'plan'], name='subscriptio_start_efb59d_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='subscriptionpayment',
+            index=models.Index(fields=['status', 'created'], name='subscriptio_status_966cdc_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='subscriptionpayment',
+            index=models.Index(fields=['provider_codename', 'created'], name='subscriptio_provide_a2e5e7_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='subscriptionpaymentrefund',
+            index=models.Index(fields=['status', 'created'], name='subscriptio_status_889b7d_idx'),
+        ),
+    ]
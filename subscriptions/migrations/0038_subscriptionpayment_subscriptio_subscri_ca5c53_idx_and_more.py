@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-16 19:05
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('subscriptions', '0037_subscription_subscriptio_start_efb59d_idx_and_more'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='subscriptionpayment',
+            index=models.Index(fields=['subscription', 'created'], name='subscriptio_subscri_ca5c53_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='subscriptionpayment',
+            index=models.Index(fields=['subscription', 'status', 'created'], name='subscriptio_subscri_525e10_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-16 19:20
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('subscriptions', '0038_subscriptionpayment_subscriptio_subscri_ca5c53_idx_and_more'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='subscriptionpayment',
+            index=models.Index(condition=models.Q(('status', 0), ('subscription__isnull', False)), fields=['created'], name='subscriptionpayment_stuck_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-16 19:35
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('subscriptions', '0039_subscriptionpayment_subscriptionpayment_stuck_idx'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='subscription',
+            index=models.Index(condition=models.Q(('auto_prolong', True)), fields=['end'], name='subscription_prolong_end_idx'),
+        ),
+    ]
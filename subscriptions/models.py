@@ -18,6 +18,7 @@ from django.db.models import (
     ExpressionWrapper,
     F,
     Index,
+    Prefetch,
     Q,
     QuerySet,
     UniqueConstraint,
@@ -196,6 +197,16 @@ class SubscriptionQuerySet(models.QuerySet):
         """
         return self.filter(payments__status=SubscriptionPayment.Status.COMPLETED, payments__amount__gt=0)
 
+    def with_reference_payments(self) -> QuerySet:
+        """ Prefetch latest completed payment of each subscription for `Subscription.get_reference_payment`. """
+        return self.prefetch_related(Prefetch(
+            'payments',
+            queryset=SubscriptionPayment.objects.filter(
+                status=SubscriptionPayment.Status.COMPLETED,
+            ).order_by('subscription', '-created').distinct('subscription'),
+            to_attr='reference_payments',
+        ))
+
     def with_ages(self, at: datetime | None = None) -> QuerySet:
         return self.annotate(
             age=ExpressionWrapper(Least(at or now(), F('end')) - F('start'), output_field=DateTimeField()),
@@ -228,6 +239,11 @@ class Subscription(models.Model):
 
     class Meta:
         get_latest_by = 'start'
+        indexes = [
+            Index(fields=('start', 'end', 'plan')),
+            # expiring auto-prolonged subscriptions lookup (background charging)
+            Index(fields=('end',), condition=Q(auto_prolong=True), name='subscription_prolong_end_idx'),
+        ]
 
     @property
     def id(self) -> str | None:
@@ -328,7 +344,7 @@ class Subscription(models.Model):
         charge_period = self.plan.charge_period
         since = since or self.start
 
-        for i in count(start=0):
+        for i in count(start=self._get_first_charge_index(since)):
             charge_date = self.start + self.initial_charge_offset + charge_period * i
 
             if charge_date < since:
@@ -342,7 +358,44 @@ class Subscription(models.Model):
 
             yield charge_date
 
+    def _get_first_charge_index(self, since: datetime) -> int:
+        """ Index of first charge date >= `since`, found by exponential + binary search. """
+
+        charge_period = self.plan.charge_period
+        if charge_period == INFINITY:
+            return 0
+
+        first_charge_date = self.start + self.initial_charge_offset
+
+        def is_before_since(i: int) -> bool:
+            try:
+                return first_charge_date + charge_period * i < since
+            except (OverflowError, ValueError):  # `relativedelta` raises ValueError past year 9999
+                return False
+
+        if not is_before_since(0):
+            return 0
+
+        low, high = 0, 1  # invariant: is_before_since(low) and not is_before_since(high)
+        while is_before_since(high):
+            low, high = high, high * 2
+
+        while high - low > 1:
+            middle = (low + high) // 2
+            if is_before_since(middle):
+                low = middle
+            else:
+                high = middle
+
+        return high
+
     def get_reference_payment(self) -> SubscriptionPayment:
+        # may be prefetched in bulk, see `SubscriptionQuerySet.with_reference_payments`
+        if (reference_payments := getattr(self, 'reference_payments', None)) is not None:
+            if not reference_payments:
+                raise SubscriptionPayment.DoesNotExist('SubscriptionPayment matching query does not exist.')
+            return reference_payments[0]
+
         return self.payments.filter(status=SubscriptionPayment.Status.COMPLETED).latest()
 
     def charge_offline(self) -> SubscriptionPayment:
@@ -499,6 +552,7 @@ class AbstractTransaction(models.Model):
         abstract = True
         indexes = [
             Index(fields=('provider_codename', 'provider_transaction_id')),
+            Index(fields=('status', 'created')),
         ]
         get_latest_by = 'created'
 
@@ -541,14 +595,26 @@ class SubscriptionPayment(AbstractTransaction):
     subscription_start = models.DateTimeField(blank=True, null=True)  # TODO: paid from
     subscription_end = models.DateTimeField(blank=True, null=True)  # TODO: paid until
 
+    class Meta(AbstractTransaction.Meta):
+        indexes = AbstractTransaction.Meta.indexes + [
+            Index(fields=('provider_codename', 'created')),
+            # previous charge attempts lookup: any attempt within charge period or any pending one
+            Index(fields=('subscription', 'created')),
+            Index(fields=('subscription', 'status', 'created')),
+            # stuck pending payments lookup
+            Index(
+                fields=('created',),
+                condition=Q(status=AbstractTransaction.Status.PENDING, subscription__isnull=False),
+                name='subscriptionpayment_stuck_idx',
+            ),
+        ]
+        # TODO: changing latest() to `subscription_end` may not work well when subscription_end is None
+        # get_latest_by = 'subscription_end'
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._initial_status = self.uid and self.status
 
-    # TODO: changing latest() to `subscription_end` may not work well when subscription_end is None
-    # class Meta:
-    #     get_latest_by = 'subscription_end'
-
     def __str__(self) -> str:
         return f'{self.short_id} {self.get_status_display()} {self.user} {self.amount} from={self.subscription_start} until={self.subscription_end}'
 
@@ -22,6 +22,14 @@ from tenacity import (
 
 log = getLogger(__name__)
 
+RETRY_STATUS_CODES = {
+    requests.codes.too_many_requests,
+    requests.codes.internal_server_error,
+    requests.codes.bad_gateway,
+    requests.codes.service_unavailable,
+    requests.codes.gateway_timeout,
+}
+
 
 class PaddleError(Exception):
     def __init__(self, message, code: int):
@@ -34,20 +42,26 @@ class PaddleAuth(AuthBase):
     vendor_id: str
     vendor_auth_code: str
 
-    def __call__(self, request: requests.PreparedRequest):
-        params = {
+    def __post_init__(self):
+        self._params = {
             'vendor_id': self.vendor_id,
             'vendor_auth_code': self.vendor_auth_code,
         }
+        # form-encoded bodies are already url-safe, so the auth part can be built once
+        self._params_urlencoded = urlencode(self._params, doseq=False)
+
+    def __call__(self, request: requests.PreparedRequest):
         if request.method == 'GET':
-            request.prepare_url(request.url, params)
+            request.prepare_url(request.url, self._params)
         else:
             if isinstance(request.body, bytes):
                 payload = json.loads(request.body.decode('utf8')) if request.body else {}
-                payload.update(params)
+                payload.update(self._params)
                 request.body = json.dumps(payload).encode('utf8')
+            elif request.body:
+                request.body = f'{request.body}&{self._params_urlencoded}'
             else:
-                request.body = (f'{request.body}&' if request.body else '') + urlencode(params, doseq=False)
+                request.body = self._params_urlencoded
         return request
 
 
@@ -81,15 +95,7 @@ class Paddle:
     TIMEOUT: ClassVar[timedelta] = timedelta(seconds=30)
 
     _retry: retry_base = retry(
-        retry=retry_if_result(
-            lambda response: response.status_code in {
-                requests.codes.too_many_requests,
-                requests.codes.internal_server_error,
-                requests.codes.bad_gateway,
-                requests.codes.service_unavailable,
-                requests.codes.gateway_timeout,
-            },
-        ),
+        retry=retry_if_result(lambda response: response.status_code in RETRY_STATUS_CODES),
         stop=stop_after_attempt(10),
         wait=wait_incrementing(start=1, increment=2),
     )
@@ -120,18 +126,34 @@ class Paddle:
         message: str = '',
         metadata: dict | None = None,
     ) -> str:
+        return self.post('/product/generate_pay_link', json=self._payment_link_payload(
+            product_id=product_id,
+            prices=prices,
+            email=email,
+            message=message,
+            metadata=metadata,
+        ))
+
+    @staticmethod
+    def _payment_link_payload(
+        product_id: int,
+        prices: list[Money],
+        email: str,
+        message: str = '',
+        metadata: dict | None = None,
+    ) -> dict:
         metadata_str = json.dumps(metadata or {})
         if len(metadata_str) > 1000:
             log.warning(f'Metadata string exceeds the limit of 1000 chars: {metadata_str}')
             metadata_str = metadata_str[:1000]
 
-        return self.post('/product/generate_pay_link', json={
+        return {
             'product_id': product_id,
             'prices': [f'{price.currency}:{price.amount}' for price in prices],
             'custom_message': message,
             'customer_email': email,
             'passthrough': metadata_str,
-        })
+        }
 
     @paddle_result
     def one_off_charge(
@@ -140,14 +162,21 @@ class Paddle:
         amount: Decimal,
         name: str = '',
     ) -> dict:
+        return self.post(f'/subscription/{subscription_id}/charge', json=self._one_off_charge_payload(
+            amount=amount,
+            name=name,
+        ))
+
+    @staticmethod
+    def _one_off_charge_payload(amount: Decimal, name: str = '') -> dict:
         if len(name) > 50:
             log.warning(f'Name exceeds the limit of 50 chars: {name}')
             name = name[:50]
 
-        return self.post(f'/subscription/{subscription_id}/charge', json={
+        return {
             'amount': str(amount),
             'charge_name': name,
-        })
+        }
 
     @paddle_result
     def get_payments(
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field
+from datetime import timedelta
+from decimal import Decimal
+from functools import wraps
+from typing import Callable, ClassVar
+
+import httpx
+from djmoney.money import Money
+from tenacity import retry_base
+
+from .api import Paddle, PaddleError
+
+
+def async_paddle_result(fn: Callable) -> Callable:
+    @wraps(fn)
+    async def wrapper(*args, **kwargs):
+        response = await fn(*args, **kwargs)
+
+        try:
+            result = response.json()
+        except json.JSONDecodeError:
+            assert not response.is_success
+            response.raise_for_status()
+
+        if not result['success']:
+            raise PaddleError(result['error']['message'], code=result['error']['code'])
+
+        return result['response']
+
+    return wrapper
+
+
+@dataclass
+class AsyncPaddle:
+    """
+    Asyncio counterpart of `Paddle` for issuing many calls concurrently, e.g.
+    `await asyncio.gather(*(paddle.one_off_charge(...) for ...))`.
+    Requests are multiplexed over a single HTTP/2 connection where possible.
+    """
+
+    vendor_id: int
+    vendor_auth_code: str
+    endpoint: str = Paddle.endpoint
+
+    _client: httpx.AsyncClient = field(init=False, default=None, repr=False)
+    TIMEOUT: ClassVar[timedelta] = Paddle.TIMEOUT
+    LIMITS: ClassVar[httpx.Limits] = httpx.Limits(max_connections=50, max_keepalive_connections=20)
+
+    _retry: retry_base = Paddle._retry
+
+    def __post_init__(self):
+        self._auth_params = {
+            'vendor_id': self.vendor_id,
+            'vendor_auth_code': self.vendor_auth_code,
+        }
+        self._client = httpx.AsyncClient(
+            base_url=self.endpoint,
+            timeout=self.TIMEOUT.total_seconds(),
+            limits=self.LIMITS,
+            http2=True,
+        )
+        self.request = self._retry(self.request)
+
+    async def __aenter__(self) -> AsyncPaddle:
+        return self
+
+    async def __aexit__(self, *args, **kwargs):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def request(self, method, endpoint, *args, **kwargs) -> httpx.Response:
+        assert endpoint.startswith('/')
+        if method == 'get':
+            kwargs['params'] = {**kwargs.get('params', {}), **self._auth_params}
+        else:
+            kwargs['json'] = {**kwargs.get('json', {}), **self._auth_params}
+        return await self._client.request(method, endpoint, *args, **kwargs)
+
+    # not partialmethods, as those would bind `request` before it is wrapped with retries in `__post_init__`
+    async def get(self, endpoint, *args, **kwargs) -> httpx.Response:
+        return await self.request('get', endpoint, *args, **kwargs)
+
+    async def post(self, endpoint, *args, **kwargs) -> httpx.Response:
+        return await self.request('post', endpoint, *args, **kwargs)
+
+    @async_paddle_result
+    async def list_subscription_plans(self) -> list[dict]:
+        return await self.get('/subscription/plans')
+
+    @async_paddle_result
+    async def generate_payment_link(
+        self,
+        product_id: int,
+        prices: list[Money],
+        email: str,
+        message: str = '',
+        metadata: dict | None = None,
+    ) -> str:
+        return await self.post('/product/generate_pay_link', json=Paddle._payment_link_payload(
+            product_id=product_id,
+            prices=prices,
+            email=email,
+            message=message,
+            metadata=metadata,
+        ))
+
+    @async_paddle_result
+    async def one_off_charge(
+        self,
+        subscription_id: int,
+        amount: Decimal,
+        name: str = '',
+    ) -> dict:
+        return await self.post(f'/subscription/{subscription_id}/charge', json=Paddle._one_off_charge_payload(
+            amount=amount,
+            name=name,
+        ))
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import sys
 from collections import Counter, defaultdict
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
@@ -8,7 +9,8 @@ from statistics import median
 from typing import Iterator
 
 from djmoney.money import Money
-from django.db.models import Q, QuerySet
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, QuerySet, Sum
+from django.db.models.expressions import Combinable
 from django.utils.timezone import now
 
 from dateutil.rrule import rrule
@@ -20,7 +22,53 @@ from .models import AbstractTransaction, Plan, Subscription, SubscriptionPayment
 from .utils import NO_MONEY
 
 
+def _get_amount_expression(with_quantity: bool = True) -> Combinable:
+    return F('amount') * F('quantity') if with_quantity else F('amount')
+
+
+def _sum_amounts(queryset: QuerySet, with_quantity: bool = True) -> Money:
+    """ Sum non-empty amounts on the DB side, one row per currency. """
+    totals = (
+        queryset
+        .filter(amount__isnull=False)
+        .order_by()
+        .values('amount_currency')
+        .annotate(total=Sum(_get_amount_expression(with_quantity), output_field=DecimalField()))
+        .values_list('total', 'amount_currency')
+    )
+    amounts = [Money(total, currency) for total, currency in totals]
+    return sum(amounts) if amounts else NO_MONEY
+
+
+def _median_amount(queryset: QuerySet, with_quantity: bool = True) -> Money | None:
+    """ Median of non-empty amounts; raw decimals are used and wrapped into Money only once. """
+    amounts = (
+        queryset
+        .filter(amount__isnull=False)
+        .annotate(total=ExpressionWrapper(_get_amount_expression(with_quantity), output_field=DecimalField()))
+        .values_list('total', 'amount_currency')
+    )
+    values_by_currency = defaultdict(list)
+    for value, currency in amounts:
+        values_by_currency[currency].append(value)
+
+    if not values_by_currency:
+        return
+
+    if len(values_by_currency) > 1:
+        raise ValueError(f'Cannot calculate median of amounts in different currencies: {set(values_by_currency)}')
+
+    (currency, values), = values_by_currency.items()
+    return Money(median(values), currency)
+
+
+# reports are created in bulk by `iter_periods`, so avoid per-instance `__dict__` where possible;
+# `slots` argument is supported by dataclasses since python 3.10
+DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+
 class IterPeriodsMixin:
+    __slots__ = ()
 
     @classmethod
     def iter_periods(cls, frequency: int, since: datetime, until: datetime, **kwargs) -> Iterator:
@@ -40,7 +88,7 @@ class IterPeriodsMixin:
             yield cls(since=end, until=until, **kwargs)
 
 
-@dataclass
+@dataclass(**DATACLASS_SLOTS)
 class SubscriptionsReport(IterPeriodsMixin):
     """
     Report for subscriptions. Period's end is excluded: [since, until)
@@ -120,13 +168,12 @@ class SubscriptionsReport(IterPeriodsMixin):
 
     def get_active_plans_total(self) -> Counter[Plan]:
         """ Overall number of quantities per plan. """
-        counter = Counter()
-        for plan, quantity in self.get_active_plans_and_quantities():
-            counter[plan] += quantity
-        return counter
+        totals = dict(self.active.order_by().values_list('plan').annotate(total=Sum('quantity')))
+        id_to_plan = Plan.objects.in_bulk(totals.keys())
+        return Counter({id_to_plan[plan_id]: total for plan_id, total in totals.items()})
 
 
-@dataclass
+@dataclass(**DATACLASS_SLOTS)
 class TransactionsReport(IterPeriodsMixin):
     """
     Report for transactions. Period's end is excluded: [since, until)
@@ -152,7 +199,7 @@ class TransactionsReport(IterPeriodsMixin):
 
     def get_payments_count_by_status(self) -> Counter[AbstractTransaction.Status]:
         """ Payments' statuses and their respective counts."""
-        return Counter(self.payments.values_list('status', flat=True))
+        return Counter(dict(self.payments.order_by().values_list('status').annotate(count=Count('pk'))))
 
     @property
     def completed_payments(self) -> QuerySet:
@@ -168,28 +215,27 @@ class TransactionsReport(IterPeriodsMixin):
 
     def get_completed_payments_average(self) -> Money | None:
         """ Median amount for completed payments. """
-        amounts = [amount for amount in self.get_completed_payments_amounts() if amount is not None]
-        if amounts:
-            return median(amounts)
+        return _median_amount(self.completed_payments)
 
     def get_completed_payments_total(self) -> Money:
         """ Total amount for completed payments. """
-        amounts = [amount for amount in self.get_completed_payments_amounts() if amount is not None]
-        return sum(amounts) if amounts else NO_MONEY
+        return _sum_amounts(self.completed_payments)
+
+    @property
+    def incompleted_payments(self) -> QuerySet:
+        return self.payments.exclude(status=AbstractTransaction.Status.COMPLETED)
 
     def get_incompleted_payments_amounts(self) -> list[Money | None]:
         """ list of amounts for incompleted payments. """
-        incompleted_payments = self.payments.exclude(status=AbstractTransaction.Status.COMPLETED)
         return [
             Money(amount, amount_currency) * quantity if amount is not None else None
             for amount, amount_currency, quantity
-            in incompleted_payments.values_list('amount', 'amount_currency', 'quantity')
+            in self.incompleted_payments.values_list('amount', 'amount_currency', 'quantity')
         ]
 
     def get_incompleted_payments_total(self) -> Money:
         """ Total amount for incompleted payments. """
-        amounts = [amount for amount in self.get_incompleted_payments_amounts() if amount is not None]
-        return sum(amounts) if amounts else NO_MONEY
+        return _sum_amounts(self.incompleted_payments)
 
     @property
     def refunds(self) -> QuerySet:
@@ -216,14 +262,11 @@ class TransactionsReport(IterPeriodsMixin):
 
     def get_refunds_average(self) -> Money | None:
         """ Median amount for refunds. """
-        amounts = [amount for amount in self.get_refunds_amounts() if amount is not None]
-        if amounts:
-            return median(amounts)
+        return _median_amount(self.refunds, with_quantity=False)
 
     def get_refunds_total(self) -> Money | None:
         """ Total amount for refunds. """
-        amounts = [amount for amount in self.get_refunds_amounts() if amount is not None]
-        return sum(amounts) if amounts else NO_MONEY
+        return _sum_amounts(self.refunds, with_quantity=False)
 
     def get_estimated_recurring_charge_amounts_by_time(self) -> dict[datetime, Money]:
         """
@@ -5,10 +5,12 @@ from django.contrib.auth import get_user_model
 from django.db import transaction
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from django.test.signals import setting_changed
 from django.utils.timezone import now
 
 from .functions import add_default_plan_to_users, get_default_plan
 from .models import MAX_DATETIME, Plan, Subscription
+from .providers import get_provider, get_providers
 
 log = logging.getLogger(__name__)
 
@@ -26,6 +28,13 @@ def create_default_subscription_for_new_user(sender, instance, created, **kwargs
             )
 
 
+@receiver(setting_changed)
+def clear_providers_cache(sender, setting, **kwargs):
+    if setting == 'SUBSCRIPTIONS_PAYMENT_PROVIDERS':
+        get_providers.cache_clear()
+        get_provider.cache_clear()
+
+
 with suppress(ImportError):
     from constance.signals import config_updated
 
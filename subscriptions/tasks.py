@@ -1,21 +1,38 @@
 from __future__ import annotations
 
-from collections import defaultdict
+import os
+from bisect import bisect_right
 from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
-from functools import partial
+from functools import partial, reduce
+from itertools import chain, groupby
 from logging import getLogger
-from typing import Iterable
+from operator import attrgetter, or_
+from typing import Callable, Iterable, Iterator, Sequence
 
 from django.conf import settings
-from django.db import transaction
-from django.db.models import Q, QuerySet
+from django.db import connections, transaction
+from django.db.models import (
+    Case,
+    Count,
+    DateTimeField,
+    Exists,
+    ExpressionWrapper,
+    F,
+    OuterRef,
+    Q,
+    QuerySet,
+    Subquery,
+    Value,
+    When,
+)
 from django.utils.timezone import now
-from more_itertools import first, pairwise
+from more_itertools import pairwise
 
 from .defaults import (
     DEFAULT_NOTIFY_PENDING_PAYMENTS_AFTER,
     DEFAULT_SUBSCRIPTIONS_OFFLINE_CHARGE_ATTEMPTS_SCHEDULE,
+    DEFAULT_SUBSCRIPTIONS_OFFLINE_CHARGE_MAX_THREADS,
 )
 from .exceptions import PaymentError, ProlongationImpossible
 from .models import Subscription, SubscriptionPayment
@@ -28,35 +45,128 @@ DEFAULT_CHARGE_ATTEMPTS_SCHEDULE = getattr(
     'SUBSCRIPTIONS_OFFLINE_CHARGE_ATTEMPTS_SCHEDULE',
     DEFAULT_SUBSCRIPTIONS_OFFLINE_CHARGE_ATTEMPTS_SCHEDULE,
 )
+CHARGE_MAX_THREADS = getattr(
+    settings,
+    'SUBSCRIPTIONS_OFFLINE_CHARGE_MAX_THREADS',
+    DEFAULT_SUBSCRIPTIONS_OFFLINE_CHARGE_MAX_THREADS,
+)
+CHARGE_PAGE_SIZE = 1000
+
+
+def _get_previous_payment_attempts_filters(charge_period_start, charge_period_end) -> tuple[Q, ...]:
+    # we don't want to try charging if
+    # 1) there is already ANY charge attempt (successful or not) in this charge period
+    # (so if there was ERROR charge in this period, we will try again only in next period)
+    # 2) there is already any PENDING charge attempt; all charge attempts should end up
+    # being in COMPLETED/ERROR/ABANDONED etc state, and PENDING payments will be garbage-collected
+    # by a separate task
+    # these are kept apart rather than OR-ed, so that each one is checked by a separate
+    # EXISTS which can use its own index instead of scanning all payments of a subscription
+    return (
+        Q(created__gte=charge_period_start, created__lt=charge_period_end),  # any attempt in this period
+        Q(status=SubscriptionPayment.Status.PENDING),  # any pending attempt
+    )
+
+
+def _get_previous_payment_attempts_exist(charge_period_start, charge_period_end) -> list[Exists]:
+    return [
+        Exists(SubscriptionPayment.objects.filter(filter_, subscription=OuterRef('pk')))
+        for filter_ in _get_previous_payment_attempts_filters(charge_period_start, charge_period_end)
+    ]
+
+
+def _get_charge_period_annotations(schedule: list[timedelta], at: datetime) -> dict[str, Case]:
+    """
+    SQL counterpart of finding the charge period which `at` falls within,
+    i.e. `end + schedule[i] <= at < end + schedule[i + 1]`.
+    """
+    charge_periods = list(pairwise(schedule))
+
+    def charge_date(index: int) -> Case:
+        return Case(
+            *(
+                When(
+                    end__lte=at - period[0],
+                    end__gt=at - period[1],
+                    then=ExpressionWrapper(F('end') + Value(period[index]), output_field=DateTimeField()),
+                )
+                for period in charge_periods
+            ),
+            output_field=DateTimeField(),
+        )
+
+    return {
+        'charge_period_start': charge_date(0),
+        'charge_period_end': charge_date(1),
+    }
+
+
+def _log_previous_payment_attempts(previous_payment_attempts: list[SubscriptionPayment]):
+    log.debug('Skipping this payment, because of already existing payment attempt(s): %s', previous_payment_attempts)
+
+    if len(previous_payment_attempts) > 1:
+        log.warning('Multiple payment attempts detected (should be at most 1 attempt): %s', previous_payment_attempts)
+
+    if (successful_attempts := [
+        attempt for attempt in previous_payment_attempts
+        if attempt.status == SubscriptionPayment.Status.COMPLETED
+    ]):
+        log.warning('Previous payment attempt was successful but subscription end is still approaching: %s', successful_attempts)
+
+
+def _log_unexpected_payment_attempts(subscriptions: QuerySet):
+    """
+    Subscriptions with previous payment attempts are filtered out in SQL without being
+    fetched, so attempts which are not supposed to exist are looked up separately;
+    normally there are none, so this is a single query.
+    """
+    previous_payment_attempts = SubscriptionPayment.objects.filter(
+        reduce(or_, _get_previous_payment_attempts_filters(OuterRef('charge_period_start'), OuterRef('charge_period_end'))),
+        subscription=OuterRef('pk'),
+    )
+    unexpected = subscriptions.annotate(
+        previous_payment_attempts_count=Subquery(
+            previous_payment_attempts.order_by().values('subscription').annotate(count=Count('*')).values('count'),
+        ),
+    ).filter(
+        Q(previous_payment_attempts_count__gt=1) |
+        Exists(previous_payment_attempts.filter(status=SubscriptionPayment.Status.COMPLETED))
+    ).values_list('pk', 'charge_period_start', 'charge_period_end')
+
+    for subscription_pk, *charge_period in unexpected:
+        _log_previous_payment_attempts(list(
+            SubscriptionPayment.objects.filter(
+                reduce(or_, _get_previous_payment_attempts_filters(*charge_period)),
+                subscription=subscription_pk,
+            ).select_related('user')  # payment's __str__ is used for logging
+        ))
 
 
 @transaction.atomic
 def _charge_recurring_subscription(
     subscription: Subscription,
-    schedule: Iterable[timedelta],
+    schedule: Sequence[timedelta],
     at: datetime,
     lock: bool = True,
-):
-    if lock:
-        # here we lock specific subscription object, so that we don't try charging it twice
-        # at the same time
-        _ = list(Subscription.objects.filter(pk=subscription.pk).select_for_update(of=('self',)))  # TODO: skip_locked=True?
-
+) -> Subscription | None:
+    """
+    Returns the subscription itself if it cannot be prolonged
+    and its auto-prolongation should be turned off.
+    """
     log.debug('Processing subscription %s', subscription)
 
     # expiration_date = next(subscription.iter_charge_dates(since=now_))
     # TODO: what if `subscription.end_date` expiration_date doesn't match `subscription.iter_charge_dates()`?
     expiration_date = subscription.end
 
-    charge_dates = [expiration_date + delta for delta in schedule]
-    charge_periods = pairwise(charge_dates)
-
-    try:
-        charge_period = first(period for period in charge_periods if period[0] <= at < period[1])
-    except ValueError:
+    # `schedule` is sorted, so the charge period `at` falls within is found by bisection
+    period_index = bisect_right(schedule, at - expiration_date) - 1
+    if not 0 <= period_index < len(schedule) - 1:
         log.warning('Current time %s doesn\'t fall within any charge period, skipping', at)
         return
 
+    charge_period = (expiration_date + schedule[period_index], expiration_date + schedule[period_index + 1])
+
     log.debug(
         'Current time %s falls within period %s (delta: %s)',
         at,
@@ -64,29 +174,30 @@ def _charge_recurring_subscription(
         expiration_date - at,
     )
 
-    # we don't want to try charging if
-    # 1) there is already ANY charge attempt (successful or not) in this charge period
-    # (so if there was ERROR charge in this period, we will try again only in next period)
-    # 2) there is already any PENDING charge attempt; all charge attempts should end up
-    # being in COMPLETED/ERROR/ABANDONED etc state, and PENDING payments will be garbage-collected
-    # by a separate task
-    previous_payment_attempts = subscription.payments.filter(
-        Q(created__gte=charge_period[0], created__lt=charge_period[1]) |  # any attempt in this period
-        Q(status=SubscriptionPayment.Status.PENDING)  # any pending attempt
-    )
-    if previous_payment_attempts.exists():
-        previous_payment_attempts = list(previous_payment_attempts)
-        log.debug('Skipping this payment, because of already existing payment attempt(s): %s', previous_payment_attempts)
-
-        if len(previous_payment_attempts) > 1:
-            log.warning('Multiple payment attempts detected (should be at most 1 attempt): %s', previous_payment_attempts)
+    previous_payment_attempts_filters = _get_previous_payment_attempts_filters(*charge_period)
 
-        if (successful_attempts := [
-            attempt for attempt in previous_payment_attempts
-            if attempt.status == SubscriptionPayment.Status.COMPLETED
-        ]):
-            log.warning('Previous payment attempt was successful but subscription end is still approaching: %s', successful_attempts)
+    subscriptions = Subscription.objects.filter(pk=subscription.pk)
+    if lock:
+        # here we lock specific subscription object, so that we don't try charging it twice
+        # at the same time; if another worker holds the lock, it is already charging it
+        subscriptions = subscriptions.select_for_update(of=('self',), skip_locked=True)
+
+    # `charge_recurring_subscriptions` already skips subscriptions with previous attempts,
+    # but payments could have been created by someone else in the meantime, so this is
+    # re-checked in the same round-trip which locks the subscription
+    has_previous_payment_attempts = subscriptions.annotate(
+        has_previous_payment_attempts=reduce(or_, _get_previous_payment_attempts_exist(*charge_period)),
+    ).values_list('has_previous_payment_attempts', flat=True).first()
+
+    if has_previous_payment_attempts is None:
+        log.debug('Subscription %s is locked by another worker, skipping', subscription)
+        return
 
+    if has_previous_payment_attempts:
+        _log_previous_payment_attempts(list(
+            subscription.payments.filter(reduce(or_, previous_payment_attempts_filters))
+            .select_related('user')  # payment's __str__ is used for logging
+        ))
         return
 
     log.debug('Trying to prolong subscription %s', subscription)
@@ -94,13 +205,11 @@ def _charge_recurring_subscription(
         subscription.prolong()  # try extending end date of subscription
         log.debug('Prolongation of subscription is possible')
     except ProlongationImpossible as exc:
-        # cannot prolong anymore, disable auto_prolong for this subscription
+        # cannot prolong anymore, auto_prolong for this subscription is disabled by the caller
         log.debug('Prolongation of subscription is impossible: %s', exc)
         subscription.auto_prolong = False
-        subscription.save()
-        log.debug('Turned off auto-prolongation of subscription %s', subscription)
         # TODO: send email to user
-        return
+        return subscription
 
     try:
         log.debug('Offline-charging subscription %s', subscription)
@@ -110,7 +219,9 @@ def _charge_recurring_subscription(
 
         # here we create a failed SubscriptionPayment to indicate that we tried
         # to charge but something went wrong, so that subsequent task calls
-        # won't try charging and sending email again within same charge_period
+        # won't try charging and sending email again within same charge_period;
+        # it is written while the subscription is still locked, so that other workers
+        # see the attempt as soon as the lock is released
         SubscriptionPayment.objects.create(
             provider_codename='',
             user=subscription.user,
@@ -134,11 +245,52 @@ def notify_stuck_pending_payments(older_than: timedelta = DEFAULT_NOTIFY_PENDING
         created__lte=now() - older_than,
         status=SubscriptionPayment.Status.PENDING,
         subscription__isnull=False,  # ignore initial payments (abandoned carts)
-    )
-    for payment in stuck_payments:
+    ).select_related('user')  # payment's __str__ is used for logging
+    for payment in stuck_payments.iterator():
         log.error('Payment stuck in pending state: %s', payment)
 
 
+def _iter_pages(queryset: QuerySet, page_size: int) -> Iterator[list]:
+    """ Keyset pagination, so that only one page of objects is kept in memory and no cursor is held open. """
+    queryset = queryset.order_by('pk')
+    page = list(queryset[:page_size])
+    while page:
+        yield page
+        if len(page) < page_size:
+            return
+        page = list(queryset.filter(pk__gt=page[-1].pk)[:page_size])
+
+
+def _charge_recurring_subscriptions_batch(
+    subscriptions: Iterable[Subscription],
+    charge: Callable[[Subscription], Subscription | None],
+    close_connections: bool = False,
+):
+    non_prolongable_subscriptions = []
+    try:
+        for subscription in subscriptions:
+            try:
+                result = charge(subscription)
+            except Exception:
+                log.exception('Failed to charge subscription %s', subscription)
+                continue
+
+            if isinstance(result, Subscription):
+                non_prolongable_subscriptions.append(result)
+    finally:
+        # turning auto-prolongation off is idempotent, so it doesn't have to be written
+        # in the same transaction as the prolongation check itself
+        if non_prolongable_subscriptions:
+            Subscription.objects.filter(
+                pk__in=[subscription.pk for subscription in non_prolongable_subscriptions],
+            ).update(auto_prolong=False)
+            log.debug('Turned off auto-prolongation of subscriptions %s', non_prolongable_subscriptions)
+
+        if close_connections:
+            # connections are thread-local, so ones opened by pool threads would leak otherwise
+            connections.close_all()
+
+
 def charge_recurring_subscriptions(
     subscriptions: QuerySet | None = None,
     schedule: Iterable[timedelta] = DEFAULT_CHARGE_ATTEMPTS_SCHEDULE,
@@ -152,6 +304,10 @@ def charge_recurring_subscriptions(
     if not schedule:
         return
 
+    if len(schedule) < 2:
+        log.warning('Charge schedule %s needs at least two deltas to define a charge period, skipping', schedule)
+        return
+
     now_ = now()
 
     subscriptions = Subscription.objects.all() if subscriptions is None else subscriptions
@@ -161,11 +317,22 @@ def charge_recurring_subscriptions(
     ).expiring(
         since=now_ - schedule[-1],
         within=schedule[-1] - schedule[0],
-    ).select_related(
-        'user', 'plan',
+    ).annotate(
+        **_get_charge_period_annotations(schedule, now_),
     )
 
-    if not expiring_subscriptions.exists():
+    _log_unexpected_payment_attempts(expiring_subscriptions)
+
+    expiring_subscriptions = expiring_subscriptions.filter(*(
+        ~exists
+        for exists in _get_previous_payment_attempts_exist(OuterRef('charge_period_start'), OuterRef('charge_period_end'))
+    )).select_related(
+        'user', 'plan',
+    ).with_reference_payments()
+
+    # evaluate first page instead of asking the DB whether there are any subscriptions and then fetching them
+    pages = _iter_pages(expiring_subscriptions, CHARGE_PAGE_SIZE)
+    if not (first_page := next(pages, None)):
         log.debug('No subscriptions to charge')
         return
 
@@ -177,17 +344,29 @@ def charge_recurring_subscriptions(
     )
 
     if num_threads is not None and num_threads < 2:
-        for subscription in expiring_subscriptions:
-            try:
-                charge(subscription)
-            except Exception:
-                log.exception('Failed to charge subscription %s', subscription)
+        for page in chain([first_page], pages):
+            _charge_recurring_subscriptions_batch(page, charge)
     else:
-        with ThreadPoolExecutor(max_workers=num_threads) as pool:
-            wait(
-                pool.submit(charge, subscription)
-                for subscription in expiring_subscriptions
+        if num_threads is None:
+            # same default as ThreadPoolExecutor's, but limited by DB connections available for charging
+            num_threads = min(32, (os.cpu_count() or 1) + 4, CHARGE_MAX_THREADS)
+        elif num_threads > CHARGE_MAX_THREADS:
+            log.warning(
+                'Requested %s charging threads, but at most %s DB connections may be used (SUBSCRIPTIONS_OFFLINE_CHARGE_MAX_THREADS)',
+                num_threads,
+                CHARGE_MAX_THREADS,
             )
+            num_threads = CHARGE_MAX_THREADS
+        num_threads = min(num_threads, len(first_page))
+
+        # each thread gets its own shard of every page and its own DB connection;
+        # shards are plain lists, as lazy iterators over a shared page are not thread-safe
+        with ThreadPoolExecutor(max_workers=num_threads) as pool:
+            for page in chain([first_page], pages):
+                wait([
+                    pool.submit(_charge_recurring_subscriptions_batch, shard, charge, close_connections=True)
+                    for shard in (page[i::num_threads] for i in range(num_threads))
+                ])
 
 
 def check_unfinished_payments(within: timedelta = timedelta(hours=12)):
@@ -202,30 +381,39 @@ def check_unfinished_payments(within: timedelta = timedelta(hours=12)):
     unfinished_payments = SubscriptionPayment.objects.filter(
         created__gte=now_ - within,
         status=SubscriptionPayment.Status.PENDING,
-    )
+    ).order_by('provider_codename')
 
-    codenames = set(unfinished_payments.order_by('provider_codename').values_list('provider_codename', flat=True))
-
-    for codename in codenames:
-        get_provider(codename).check_payments(
-            unfinished_payments.filter(provider_codename=codename)
-        )
+    # payments are fetched upfront, so that no server-side cursor is held open during provider requests
+    for codename, payments in groupby(list(unfinished_payments), key=attrgetter('provider_codename')):
+        get_provider(codename).check_payments(list(payments))
 
 
 def check_duplicated_payments() -> dict[tuple[str, str], list[SubscriptionPayment]]:
-    # This is rather massive as it's checking all operations.
-    all_entries = SubscriptionPayment.objects.prefetch_related('subscription').all()
-
-    transaction_id_to_entries: defaultdict[tuple[str, str], list[SubscriptionPayment]] = defaultdict(list)
-    for entry in all_entries:
+    """
+    Returns duplicated payments grouped by (provider_codename, provider_transaction_id).
+    Payments are lightweight: only `uid`, `provider_codename`, `provider_transaction_id`,
+    `subscription_id` and `status` are loaded, and accessing any other field costs
+    an extra query per payment, so refetch them if more is needed.
+    """
+    # This is rather massive as it's checking all operations, so rows are streamed
+    # sorted by the duplication key and only duplicates are kept in memory.
+    all_entries = SubscriptionPayment.objects.filter(
         # This happens for e.g.: unconfirmed paddle. We don't worry about these.
-        if entry.provider_transaction_id is None:
-            continue
-        key = (entry.provider_codename, entry.provider_transaction_id)
-        transaction_id_to_entries[key].append(entry)
+        provider_transaction_id__isnull=False,
+    ).order_by(
+        'provider_codename', 'provider_transaction_id',
+    ).only(
+        'uid', 'provider_codename', 'provider_transaction_id', 'subscription_id',
+        'status',  # accessed in SubscriptionPayment.__init__
+    ).iterator(chunk_size=5000)
 
     result = {}
-    for (provider_codename, transaction_id), transaction_id_entries in transaction_id_to_entries.items():
+    for (provider_codename, transaction_id), transaction_id_entries in groupby(
+        all_entries,
+        key=lambda entry: (entry.provider_codename, entry.provider_transaction_id),
+    ):
+        transaction_id_entries = list(transaction_id_entries)
+
         # Single entry – no issue.
         if len(transaction_id_entries) == 1:
             continue
@@ -235,7 +423,7 @@ def check_duplicated_payments() -> dict[tuple[str, str], list[SubscriptionPaymen
 
         for idx, entry in enumerate(transaction_id_entries):
             log.info('\t%s: Subscription UID: %s, payment UID: %s',
-                     (idx + 1), entry.subscription.uid, entry.uid)
+                     (idx + 1), entry.subscription_id, entry.uid)
 
         result[(provider_codename, transaction_id)] = transaction_id_entries
 
@@ -1,8 +1,12 @@
 from __future__ import annotations
 
 import hashlib
+import heapq
 import logging
+import sys
 from datetime import datetime
+from functools import lru_cache
+from operator import itemgetter
 from typing import Callable, Iterable, Iterator, TypeVar
 
 from django.conf import settings
@@ -26,33 +30,74 @@ class NonMonothonicSequence(Exception):
     pass
 
 
-def merge_iter(*iterables: Iterable[T], key: Callable = lambda x: x) -> Iterator[T]:
-    values: dict[Iterable[T], T] = {}
-
-    # accumulate first value from each iterable
-    for iterable in iterables:
-        iterable = iter(iterable)
-        try:
-            values[iterable] = next(iterable)
-        except StopIteration:
-            pass
-
-    last_min_value = None
-    while values:
-        # consume from iterator which provides lowest value
-        min_value = min(values.values(), key=key)
-        if last_min_value is not None and key(last_min_value) > key(min_value):
+def _merge_two(first: Iterator[tuple], second: Iterator[tuple]) -> Iterator[tuple]:
+    """ Same as `heapq.merge(first, second, key=itemgetter(0))`, but without heap overhead. """
+    try:
+        first_item = next(first)
+    except StopIteration:
+        yield from second
+        return
+
+    try:
+        second_item = next(second)
+    except StopIteration:
+        yield first_item
+        yield from first
+        return
+
+    while True:
+        if second_item[0] < first_item[0]:  # on ties, items of the first iterable go first, as in `heapq.merge`
+            yield second_item
+            try:
+                second_item = next(second)
+            except StopIteration:
+                yield first_item
+                yield from first
+                return
+        else:
+            yield first_item
+            try:
+                first_item = next(first)
+            except StopIteration:
+                yield second_item
+                yield from second
+                return
+
+
+def merge_iter(*iterables: Iterable[T], key: Callable | None = None) -> Iterator[T]:
+    # key is computed once per value and then reused both for merging and for monotonicity check
+    if key is None:  # values are compared directly, without calling an identity function per value
+        keyed_iterables = [((value, value) for value in iterable) for iterable in iterables]
+    else:
+        keyed_iterables = [((key(value), value) for value in iterable) for iterable in iterables]
+
+    if len(keyed_iterables) == 1:  # e.g. a plan with a single quota, nothing to merge
+        items = keyed_iterables[0]
+    elif len(keyed_iterables) == 2:
+        items = _merge_two(*keyed_iterables)
+    else:
+        # heap of iterables' current values, so that each step costs O(log K) instead of O(K)
+        items = heapq.merge(*keyed_iterables, key=itemgetter(0))
+
+    try:
+        last_min_key, last_min_value = next(items)
+    except StopIteration:
+        return
+
+    yield last_min_value
+
+    for min_key, min_value in items:
+        if last_min_key > min_key:
             raise NonMonothonicSequence(f'{last_min_value=}, {min_value=}')
-        yield (last_min_value := min_value)
-        iterable = next(it for it, val in values.items() if val == min_value)
-        try:
-            values[iterable] = next(iterable)
-        except StopIteration:
-            del values[iterable]
+        yield min_value
+        last_min_key, last_min_value = min_key, min_value
 
 
-def fromisoformat(value: str) -> datetime:
-    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+if sys.version_info >= (3, 11):
+    fromisoformat = datetime.fromisoformat  # accepts 'Z' suffix since 3.11
+else:
+    def fromisoformat(value: str) -> datetime:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
 
 
 class AdvancedJSONEncoder(DjangoJSONEncoder):
@@ -84,8 +129,11 @@ class HardDBLock:
         lock_marker: str,
         lock_value: str | int,
         durable: bool = False,
+        savepoint: bool = True,
     ):
-        if not self.is_enabled():
+        # read once per lock, so that toggling the setting in between cannot leave the transaction open
+        self.enabled = self.is_enabled()
+        if not self.enabled:
             return
 
         self.db_name = router.db_for_write(models.Model)
@@ -97,27 +145,32 @@ class HardDBLock:
         self.lock_marker = self._pg_str_to_int(lock_marker)
         self.lock_value = self._pg_str_to_int(lock_value)
         self.durable = durable
+        # when already inside a transaction, savepoint=False takes the lock right in it, saving
+        # SAVEPOINT / RELEASE SAVEPOINT round-trips; an error then marks the outer transaction for rollback
+        self.savepoint = savepoint
         self.transaction = None
 
-    def _pg_str_to_int(self, in_value: str | int) -> int:
+    @classmethod
+    @lru_cache(maxsize=1024)  # same lock markers (and often values) are used over and over again
+    def _pg_str_to_int(cls, in_value: str | int) -> int:
         # Note: transaction id could be a string representing a number. So, if it's possible to use it as a number
         # we do, and if there's a string, it's ok too. This is e.g.: a case for apple transaction ID.
         try:
             out_value = int(in_value)
         except ValueError:
             out_value = int(hashlib.sha1(in_value.encode('utf-8')).hexdigest(), 16)
-        return out_value % self.PSQL_MAX_LOCK_VALUE
+        return out_value % cls.PSQL_MAX_LOCK_VALUE
 
     @classmethod
     def is_enabled(cls) -> bool:
         return env.bool('ENABLE_HARD_DB_LOCK', True)
 
     def __enter__(self):
-        if not self.is_enabled():
+        if not self.enabled:
             return
 
         # Open our own transaction that will be guarded by the advisory lock.
-        self.transaction = transaction.atomic(using=self.db_name, durable=self.durable)
+        self.transaction = transaction.atomic(using=self.db_name, savepoint=self.savepoint, durable=self.durable)
         self.transaction.__enter__()
 
         with connections[self.db_name].cursor() as cursor:
@@ -131,7 +184,7 @@ class HardDBLock:
         return self
 
     def __exit__(self, *args, **kwargs):
-        if not self.is_enabled():
+        if not self.enabled:
             return
 
         self.transaction.__exit__(*args, **kwargs)
@@ -1,6 +1,7 @@
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.exceptions import ValidationError
 from django.http import Http404
+from django.shortcuts import get_object_or_404
 from django.views.generic import DetailView, ListView, TemplateView
 
 from .exceptions import PaymentError, ProviderNotFound
@@ -19,7 +20,7 @@ class PlanView(DetailView):
     model = Plan
 
     def get_object(self):
-        return self.model.objects.get(id=self.kwargs['id'])
+        return get_object_or_404(self.model, id=self.kwargs['plan_id'])
 
 
 class PlanSubscriptionView(LoginRequiredMixin, PlanView):
@@ -32,11 +33,14 @@ class PlanSubscriptionView(LoginRequiredMixin, PlanView):
         except ProviderNotFound:
             raise Http404()
 
-        self.plan = Plan.objects.get(id=kwargs['id'])
+        self.plan = super().get_object()
         self.form = form(request.POST or None) if (form := self.payment_provider.form) else None
 
         return super().dispatch(request, *args, **kwargs)
 
+    def get_object(self):
+        return self.plan  # already fetched in `dispatch`
+
     def post(self, request, *args, **kwargs):
 
         if self.form.is_valid():